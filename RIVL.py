@@ -1,7 +1,28 @@
 import sys
 import os
+import re
+import json
+import argparse
+import time
+import hashlib
+import itertools
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+try:
+    import resource
+except ImportError:  # Windows; resource sampling falls back to wall time only
+    resource = None
 os.environ["QT_MEDIA_BACKEND"] = "ffmpeg"
-from PyQt6.QtCore import Qt, QTimer, QRect, QPointF, QUrl, QSize, QSizeF
+import numpy as np
+try:
+    from scipy.signal import sosfilt, firwin
+except ImportError:  # Only needed for Audio Setup
+    sosfilt = firwin = None
+from PyQt6.QtCore import Qt, QTimer, QRect, QRectF, QPointF, QUrl, QSize, QSizeF, QThread, pyqtSignal
 from PyQt6.QtGui import QImage, QPixmap, QColor, QPainter
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
@@ -11,18 +32,28 @@ from PyQt6.QtWidgets import (
     QGraphicsColorizeEffect, QMessageBox, QSizePolicy
 )
 from PyQt6.QtCore import Qt, QTimer, QRect, QPoint, QUrl
-from PyQt6.QtMultimedia import QMediaPlayer, QVideoFrame
-from PyQt6.QtMultimediaWidgets import QGraphicsVideoItem
+try:
+    from PyQt6.QtMultimedia import QMediaPlayer, QVideoFrame
+    from PyQt6.QtMultimediaWidgets import QGraphicsVideoItem
+except ImportError:  # Only needed for the GUI player; --render and --verify work without it
+    QMediaPlayer = QVideoFrame = QGraphicsVideoItem = None
 
 class AnimatedOverlayItem(QGraphicsPixmapItem):
     def __init__(self, pixmap):
         super().__init__()
         self.original_pixmap = pixmap
         self.mask_pixmap = None
+        self.white_pixmap = None
         self.setOpacity(1.0)
         self.scale_min = 0.8
         self.scale_max = 1.0
 
+        # Blend cache; blend_scale < 1 blends at reduced resolution
+        self.blend_scale = 1.0
+        self.blend_sources = None
+        self.white_fraction = 0.0
+        self.progress_scale = 1.0
+
     def set_mask_pixmap(self, background_pixmap):
         bg = background_pixmap.scaled(
             self.original_pixmap.size(),
@@ -39,21 +70,51 @@ class AnimatedOverlayItem(QGraphicsPixmapItem):
         painter.end()
 
         self.mask_pixmap = masked
-        self.update_blend_to_white(0.0)
+        self.blend_sources = None
+        self.update_blend_to_white(self.white_fraction)
+
+    def set_blend_scale(self, blend_scale):
+        if blend_scale == self.blend_scale:
+            return
+        self.blend_scale = blend_scale
+        self.blend_sources = None
+        if self.mask_pixmap is not None:
+            self.update_blend_to_white(self.white_fraction)
+        self.setScale(self.progress_scale / self.blend_scale)
+
+    def _blend_sources(self):
+        if self.blend_sources is None:
+            if self.white_pixmap is None:
+                self.white_pixmap = self._white_version()
+            masked, white = self.mask_pixmap, self.white_pixmap
+            if self.blend_scale < 1.0:
+                size = self.original_pixmap.size() * self.blend_scale
+                masked = masked.scaled(size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                       Qt.TransformationMode.SmoothTransformation)
+                white = white.scaled(size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                     Qt.TransformationMode.SmoothTransformation)
+            self.blend_sources = (masked, white)
+        return self.blend_sources
 
     def update_blend_to_white(self, fraction):
-        blended = QPixmap(self.original_pixmap.size())
+        # The hold phase asks for the same fraction every tick
+        if self.blend_sources is not None and fraction == self.white_fraction:
+            return
+        self.white_fraction = fraction
+        masked, white = self._blend_sources()
+
+        blended = QPixmap(masked.size())
         blended.fill(Qt.GlobalColor.transparent)
 
         painter = QPainter(blended)
 
         # Blend masked background first
         painter.setOpacity(1.0 - fraction)
-        painter.drawPixmap(0, 0, self.mask_pixmap)
+        painter.drawPixmap(0, 0, masked)
 
         # White version of logo on top
         painter.setOpacity(fraction)
-        painter.drawPixmap(0, 0, self._white_version())
+        painter.drawPixmap(0, 0, white)
         painter.end()
 
         self.setPixmap(blended)
@@ -71,9 +132,1543 @@ class AnimatedOverlayItem(QGraphicsPixmapItem):
         return white_pixmap
 
     def set_scale_progress(self, progress):
-        eased = progress * progress * (3 - 2 * progress)  # Ease-in-out
-        scale = self.scale_min + (self.scale_max - self.scale_min) * eased
-        self.setScale(scale)
+        self.progress_scale = overlay_scale(progress, self.scale_min, self.scale_max)
+        self.setScale(self.progress_scale / self.blend_scale)
+
+
+# How often the overlay is re-masked against the current video frame.
+# Behavior change: before the adaptive preview the mask was taken once, when
+# the overlay was loaded. Preview and offline renders now both re-mask on
+# this cadence; the governor's last level freezes the preview mask again.
+# Renders mask only frames where the overlay is visible, once per window.
+MASK_REFRESH_MS = 500
+
+# Resolution of the offscreen preview surface used under heavy load
+LOW_RES_SURFACE_SCALE = 0.5
+
+# Rendered segments span this many mask refreshes, so each starts on a fresh mask
+SEGMENT_MASK_REFRESHES = 2
+
+# Part of every segment key; bump whenever compositing or encoding output changes
+PIPELINE_VERSION = 2
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "rivl")
+RENDER_CACHE = os.path.join(CACHE_DIR, "segments")
+RENDER_CACHE_MAX_BYTES = 20 * 1024 ** 3
+# Segments used this recently are never evicted, so concurrent jobs keep theirs
+RENDER_CACHE_GRACE_S = 3600
+METRICS_DIR = os.path.join(CACHE_DIR, "metrics")
+HASH_CACHE = os.path.join(CACHE_DIR, "hashes.json")
+SESSION_PATH = os.path.join(CACHE_DIR, "session.rivl")
+
+PROJECT_VERSION = 1
+
+
+def overlay_scale(progress, scale_min=0.8, scale_max=1.0):
+    eased = progress * progress * (3 - 2 * progress)  # Ease-in-out
+    return scale_min + (scale_max - scale_min) * eased
+
+
+class OverlayTiming:
+    """Intro / hold / fade-out schedule shared by the preview and offline renders."""
+
+    def __init__(self, intro_end=2.0, fade_start=4.0, fade_end=5.0):
+        self.intro_end = intro_end
+        self.fade_start = fade_start
+        self.fade_end = fade_end
+
+    def state_at(self, pos_s):
+        """Return (scale_progress, white_fraction, opacity) at pos_s, or None when hidden."""
+        if pos_s <= self.intro_end:
+            # Scale + fade in white
+            t = pos_s / self.intro_end
+            eased = 2*t*t if t < 0.5 else 1 - pow(-2*t + 2, 2)/2
+            return eased, eased, 1.0
+
+        if pos_s <= self.fade_start:
+            # Hold full size/white
+            return 1.0, 1.0, 1.0
+
+        if pos_s <= self.fade_end:
+            # Smooth fade out
+            t = (pos_s - self.fade_start) / (self.fade_end - self.fade_start)
+            eased = 1 - pow(1 - t, 3)  # cubic ease-out
+            return 1.0, 1.0, 1.0 - eased
+
+        return None
+
+
+class PreviewGovernor:
+    """Steps preview quality down when the preview's work overruns its frame budget.
+
+    It is fed the time update_ui and the viewport paint actually took, not
+    the timer interval, so headroom is visible. Each level keeps the
+    degradations of the ones before it. Quality steps back up only once
+    work has stayed well under budget for a while; a step up that is undone
+    within that probation doubles the wait before the next attempt.
+    """
+
+    LEVELS = ["Full", "Fast transforms", "Reduced blend", "Low-res surface", "Frozen mask"]
+
+    def __init__(self, budget_ms=16, down_after=15, up_after=120, smoothing=0.1,
+                 headroom=0.6, max_backoff=8):
+        self.budget_ms = budget_ms
+        self.down_after = down_after
+        self.up_after = up_after
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.max_backoff = max_backoff
+        self.level = 0
+        self.up_wait = up_after
+        self.probation = 0
+        self.avg_ms = budget_ms
+        self.slow_frames = 0
+        self.fast_frames = 0
+
+    @property
+    def name(self):
+        return self.LEVELS[self.level]
+
+    def reset(self):
+        self.avg_ms = self.budget_ms
+        self.slow_frames = 0
+        self.fast_frames = 0
+
+    def record(self, work_ms):
+        """Feed the work time of one frame; return True when the quality level changed."""
+        self.avg_ms += (work_ms - self.avg_ms) * self.smoothing
+        if self.probation:
+            self.probation -= 1
+            if not self.probation:
+                # The last step up held, so the next one may come sooner
+                self.up_wait = self.up_after
+
+        if self.avg_ms > self.budget_ms:
+            self.slow_frames += 1
+            self.fast_frames = 0
+        elif self.avg_ms < self.budget_ms * self.headroom:
+            self.fast_frames += 1
+            self.slow_frames = 0
+        else:
+            self.slow_frames = self.fast_frames = 0
+
+        if self.slow_frames >= self.down_after and self.level < len(self.LEVELS) - 1:
+            if self.probation:
+                self.up_wait = min(self.up_wait * 2, self.up_after * self.max_backoff)
+                self.probation = 0
+            self.level += 1
+            self.reset()
+            return True
+        if self.fast_frames >= self.up_wait and self.level > 0:
+            self.level -= 1
+            self.probation = self.up_after
+            self.reset()
+            return True
+        return False
+
+
+class TimedGraphicsView(QGraphicsView):
+    """QGraphicsView that accumulates the time spent painting its viewport."""
+
+    def __init__(self, scene):
+        super().__init__(scene)
+        self.paint_ms = 0.0
+
+    def paintEvent(self, event):
+        started = time.perf_counter()
+        super().paintEvent(event)
+        self.paint_ms += (time.perf_counter() - started) * 1000
+
+    def take_paint_ms(self):
+        paint_ms, self.paint_ms = self.paint_ms, 0.0
+        return paint_ms
+
+
+def qimage_to_array(image):
+    """Copy a QImage into an H x W x 4 premultiplied RGBA uint8 array."""
+    image = image.convertToFormat(QImage.Format.Format_RGBA8888_Premultiplied)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    rows = np.frombuffer(ptr, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4).copy()
+
+
+def array_to_qimage(frame):
+    """Wrap a premultiplied RGBA uint8/uint16 array in a (copied) QImage."""
+    if frame.dtype == np.uint16:
+        fmt = QImage.Format.Format_RGBA64_Premultiplied
+    else:
+        fmt = QImage.Format.Format_RGBA8888_Premultiplied
+    frame = np.ascontiguousarray(frame)
+    height, width = frame.shape[:2]
+    return QImage(frame.tobytes(), width, height, frame.strides[0], fmt).copy()
+
+
+class TiledFrameCompositor:
+    """Pure-array counterpart of AnimatedOverlayItem for offline renders.
+
+    Frames are H x W x 4 premultiplied RGBA arrays, uint8 or uint16. Every
+    operation is split into row bands that run on a thread pool; the NumPy
+    kernels release the GIL, so bands are composited in parallel.
+    """
+
+    def __init__(self, workers=None, min_tile_rows=32):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_tile_rows = min_tile_rows
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def _run_tiled(self, height, band):
+        count = max(1, min(self.workers * 2, height // self.min_tile_rows))
+        if count == 1:
+            band(0, height)
+            return
+        bounds = np.linspace(0, height, count + 1).astype(int)
+        futures = [self.pool.submit(band, r0, r1) for r0, r1 in zip(bounds[:-1], bounds[1:])]
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def _store(dst, values):
+        np.clip(values, 0, np.iinfo(dst.dtype).max, out=values)
+        np.rint(values, out=values)
+        dst[...] = values
+
+    def scale_bilinear(self, src, width, height):
+        """Bilinear resample of src to width x height (pixel-centre aligned)."""
+        src_h, src_w = src.shape[:2]
+        if (src_w, src_h) == (width, height):
+            return src.copy()
+
+        xs = (np.arange(width, dtype=np.float32) + 0.5) * (src_w / width) - 0.5
+        ys = (np.arange(height, dtype=np.float32) + 0.5) * (src_h / height) - 0.5
+        np.clip(xs, 0, src_w - 1, out=xs)
+        np.clip(ys, 0, src_h - 1, out=ys)
+        x0 = xs.astype(np.intp)
+        y0 = ys.astype(np.intp)
+        x1 = np.minimum(x0 + 1, src_w - 1)
+        y1 = np.minimum(y0 + 1, src_h - 1)
+        wx = (xs - x0)[None, :, None]
+        wy = (ys - y0)[:, None, None]
+
+        out = np.empty((height, width, src.shape[2]), dtype=src.dtype)
+
+        def band(r0, r1):
+            top = src[y0[r0:r1]].astype(np.float32)
+            bottom = src[y1[r0:r1]].astype(np.float32)
+            rows = top + (bottom - top) * wy[r0:r1]
+            left = rows[:, x0]
+            values = left + (rows[:, x1] - left) * wx
+            self._store(out[r0:r1], values)
+
+        self._run_tiled(height, band)
+        return out
+
+    def mask_destination_in(self, background, logo):
+        """Cover-scale background to the logo and keep it where the logo is opaque."""
+        logo_h, logo_w = logo.shape[:2]
+        bg_h, bg_w = background.shape[:2]
+        factor = max(logo_w / bg_w, logo_h / bg_h)
+        cover = self.scale_bilinear(
+            background,
+            max(logo_w, round(bg_w * factor)),
+            max(logo_h, round(bg_h * factor))
+        )[:logo_h, :logo_w]
+
+        max_value = np.iinfo(logo.dtype).max
+        out = np.empty_like(logo)
+
+        def band(r0, r1):
+            alpha = logo[r0:r1, :, 3:4].astype(np.float32) / max_value
+            self._store(out[r0:r1], cover[r0:r1].astype(np.float32) * alpha)
+
+        self._run_tiled(logo_h, band)
+        return out
+
+    def white_version(self, logo):
+        """Logo silhouette filled with white (SourceIn), premultiplied."""
+        return np.repeat(logo[..., 3:4], 4, axis=2)
+
+    def blend_to_white(self, masked, white, fraction):
+        """Cross-fade the masked background into the white logo."""
+        max_value = np.iinfo(masked.dtype).max
+        out = np.empty_like(masked)
+
+        def band(r0, r1):
+            top = white[r0:r1].astype(np.float32) * fraction
+            values = masked[r0:r1].astype(np.float32) * (1.0 - fraction)
+            values *= 1.0 - top[..., 3:4] / max_value
+            values += top
+            self._store(out[r0:r1], values)
+
+        self._run_tiled(masked.shape[0], band)
+        return out
+
+    def over(self, dst, src, x, y, opacity=1.0):
+        """Premultiplied source-over of src onto dst at (x, y), in place."""
+        dst_h, dst_w = dst.shape[:2]
+        src_h, src_w = src.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + src_w, dst_w), min(y + src_h, dst_h)
+        if x0 >= x1 or y0 >= y1 or opacity <= 0:
+            return dst
+
+        max_value = np.iinfo(dst.dtype).max
+        region = dst[y0:y1, x0:x1]
+        patch = src[y0 - y:y1 - y, x0 - x:x1 - x]
+
+        def band(r0, r1):
+            top = patch[r0:r1].astype(np.float32)
+            if opacity < 1.0:
+                top *= opacity
+            values = region[r0:r1].astype(np.float32)
+            values *= 1.0 - top[..., 3:4] / max_value
+            values += top
+            self._store(region[r0:r1], values)
+
+        self._run_tiled(y1 - y0, band)
+        return dst
+
+    def composite_overlay(self, frame, masked, white, center, scale, white_fraction, opacity):
+        """Draw the animated overlay onto frame, centred on center, in place."""
+        blended = self.blend_to_white(masked, white, white_fraction)
+        logo_h, logo_w = blended.shape[:2]
+        width = max(1, round(logo_w * scale))
+        height = max(1, round(logo_h * scale))
+        scaled = self.scale_bilinear(blended, width, height)
+        return self.over(
+            frame, scaled,
+            round(center[0] - width / 2), round(center[1] - height / 2),
+            opacity
+        )
+
+
+def parse_frame_rate(rate):
+    num, _, den = (rate or "0/0").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_video(path):
+    """Return (width, height, fps, duration_s) of the first video stream.
+
+    Width and height are the displayed size: ffmpeg auto-rotates on decode,
+    so sources with 90/270 degree rotation metadata have them swapped.
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries",
+         "stream=width,height,r_frame_rate,avg_frame_rate:stream_tags=rotate"
+         ":stream_side_data=rotation:format=duration",
+         "-of", "json", path],
+        capture_output=True, text=True, check=True
+    )
+    info = json.loads(result.stdout)
+    if not info.get("streams"):
+        raise RuntimeError(f"No video stream in {path}")
+    stream = info["streams"][0]
+
+    fps = parse_frame_rate(stream.get("r_frame_rate")) or parse_frame_rate(stream.get("avg_frame_rate"))
+    if fps <= 0:
+        raise RuntimeError(f"Cannot determine the frame rate of {path}")
+
+    rotation = stream.get("tags", {}).get("rotate", 0)
+    for side_data in stream.get("side_data_list", []):
+        rotation = side_data.get("rotation", rotation)
+    width, height = int(stream["width"]), int(stream["height"])
+    if int(float(rotation)) % 180:
+        width, height = height, width
+
+    duration = float(info.get("format", {}).get("duration", 0) or 0)
+    return width, height, fps, duration
+
+
+def count_frames(path, fps, duration):
+    """Number of video frames in path, from a demux-only packet count."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-count_packets",
+             "-show_entries", "stream=nb_read_packets", "-of", "json", path],
+            capture_output=True, text=True, check=True
+        )
+        return int(json.loads(result.stdout)["streams"][0]["nb_read_packets"])
+    except (subprocess.CalledProcessError, ValueError, KeyError, IndexError):
+        return round(duration * fps)
+
+
+def prune_render_cache(cache_dir, keep, max_bytes=RENDER_CACHE_MAX_BYTES):
+    """Evict least recently used segments until the cache fits in max_bytes."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.path not in keep:
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    total += sum(os.path.getsize(path) for path in keep if os.path.exists(path))
+
+    cutoff = time.time() - RENDER_CACHE_GRACE_S
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes or mtime > cutoff:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def file_cache_key(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+# Serializes read-modify-write of the JSON caches between render jobs
+CACHE_LOCK = threading.Lock()
+
+
+def load_json_cache(cache_path):
+    """Read a JSON cache; a missing or corrupt file reads as empty."""
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_json_cache(cache_path, cache):
+    """Write a JSON cache atomically, so readers never see a partial file."""
+    directory = os.path.dirname(cache_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, partial = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        os.replace(partial, cache_path)
+    except BaseException:
+        os.remove(partial)
+        raise
+
+
+def update_json_cache(cache_path, key, value):
+    """Store one entry, merging with whatever other jobs have written since."""
+    with CACHE_LOCK:
+        cache = load_json_cache(cache_path)
+        cache[key] = value
+        save_json_cache(cache_path, cache)
+    return value
+
+
+def file_digest(path, cache_path=HASH_CACHE):
+    """Content hash of path; cached per (path, size, mtime) so unchanged sources are read once."""
+    key = file_cache_key(path)
+    cached = load_json_cache(cache_path).get(key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return update_json_cache(cache_path, key, digest.hexdigest())
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def maxrss_bytes(usage):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def peak_rss_bytes():
+    """Lifetime high-water mark of this process, or None where it cannot be read."""
+    if resource is None:
+        return None
+    return maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF))
+
+
+def cpu_seconds():
+    return time.process_time()
+
+
+def wait_with_usage(process, metrics=None):
+    """Wait for a Popen child and charge its own CPU time and peak RSS to metrics.
+
+    os.wait4 reports the usage of exactly this child, unlike RUSAGE_CHILDREN
+    deltas, which overlap between concurrent jobs.
+    """
+    if process.returncode is not None or not hasattr(os, "wait4"):
+        return process.wait()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if metrics is not None:
+        metrics.add_child_usage(usage)
+    return process.returncode
+
+
+class RenderMetrics:
+    """Stage timings, counters and resource samples for one render job.
+
+    Recording a stage is a dict update, so the frame loop can time every
+    decode/composite/encode call. RSS and CPU are sampled on a background
+    thread while the job runs; these are process-wide, so concurrent jobs
+    see each other. ffmpeg children are charged exactly through
+    wait_with_usage().
+    """
+
+    def __init__(self, job_id, sample_interval=0.5):
+        self.job_id = job_id
+        self.sample_interval = sample_interval
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.status = "queued"
+        self.stage_seconds = {}
+        self.counters = {}
+        self.rss_peak_bytes = 0
+        self.cpu_percent_peak = 0.0
+        self.cpu_seconds = 0.0
+        self.cpu_start = 0.0
+        self.children_cpu_seconds = 0.0
+        self.children_rss_peak_bytes = 0
+        self.sampler = None
+        self.stop_sampling = threading.Event()
+
+    def add_time(self, stage, seconds):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_child_usage(self, usage):
+        self.children_cpu_seconds += usage.ru_utime + usage.ru_stime
+        self.children_rss_peak_bytes = max(self.children_rss_peak_bytes, maxrss_bytes(usage))
+
+    def start(self):
+        self.started = time.time()
+        self.status = "running"
+        self.cpu_start = cpu_seconds()
+        rss = current_rss_bytes()
+        if rss is not None:
+            self.rss_peak_bytes = rss
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def sample(self):
+        last_wall, last_cpu = time.perf_counter(), cpu_seconds()
+        while not self.stop_sampling.wait(self.sample_interval):
+            wall, cpu = time.perf_counter(), cpu_seconds()
+            if wall > last_wall:
+                percent = 100 * (cpu - last_cpu) / (wall - last_wall)
+                self.cpu_percent_peak = max(self.cpu_percent_peak, percent)
+            last_wall, last_cpu = wall, cpu
+            rss = current_rss_bytes()
+            if rss is not None:
+                self.rss_peak_bytes = max(self.rss_peak_bytes, rss)
+
+    def finish(self, status):
+        self.stop_sampling.set()
+        if self.sampler:
+            self.sampler.join()
+        self.finished = time.time()
+        self.status = status
+        self.cpu_seconds = cpu_seconds() - self.cpu_start
+        rss = current_rss_bytes()
+        if rss is not None:
+            self.rss_peak_bytes = max(self.rss_peak_bytes, rss)
+
+    @property
+    def queue_wait_seconds(self):
+        return (self.started or self.submitted) - self.submitted
+
+    @property
+    def job_seconds(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def to_dict(self):
+        return {
+            "job": self.job_id,
+            "status": self.status,
+            "submitted": self.submitted,
+            "queue_wait_s": self.queue_wait_seconds,
+            "job_s": self.job_seconds,
+            "stages_s": self.stage_seconds,
+            "counters": self.counters,
+            "cpu_s": self.cpu_seconds,
+            "cpu_percent_peak": self.cpu_percent_peak,
+            "rss_peak_bytes": self.rss_peak_bytes,
+            "children_cpu_s": self.children_cpu_seconds,
+            "children_rss_peak_bytes": self.children_rss_peak_bytes,
+        }
+
+
+class MetricsExporter:
+    """Publishes finished render jobs for farm monitoring.
+
+    Each job is appended to render_jobs.jsonl, and running totals are
+    rewritten to rivl.prom in the Prometheus text format (suitable for a
+    node_exporter textfile collector). With a port, the same text is
+    served from http://127.0.0.1:<port>/metrics.
+
+    Only ffmpeg CPU is summed per job; this process's CPU and RSS are
+    exported as process gauges, since concurrent jobs share them.
+    """
+
+    def __init__(self, metrics_dir=METRICS_DIR, port=None):
+        self.jsonl_path = os.path.join(metrics_dir, "render_jobs.jsonl")
+        self.prom_path = os.path.join(metrics_dir, "rivl.prom")
+        os.makedirs(metrics_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.stage_seconds = {}
+        self.counters = {}
+        self.queue_wait = [0.0, 0]
+        self.job_seconds = [0.0, 0]
+        self.ffmpeg_cpu_seconds = 0.0
+        self.ffmpeg_rss_peak_bytes = 0
+        self.rss_peak_bytes = 0
+        self.server = None
+        if port is not None:
+            self.serve(port)
+
+    def serve(self, port):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                with exporter.lock:
+                    body = exporter.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def record(self, metrics):
+        with self.lock:
+            with open(self.jsonl_path, "a") as f:
+                f.write(json.dumps(metrics.to_dict()) + "\n")
+
+            self.jobs[metrics.status] = self.jobs.get(metrics.status, 0) + 1
+            for stage, seconds in metrics.stage_seconds.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            for name, amount in metrics.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            self.queue_wait[0] += metrics.queue_wait_seconds
+            self.queue_wait[1] += 1
+            self.job_seconds[0] += metrics.job_seconds
+            self.job_seconds[1] += 1
+            self.ffmpeg_cpu_seconds += metrics.children_cpu_seconds
+            self.ffmpeg_rss_peak_bytes = max(self.ffmpeg_rss_peak_bytes,
+                                             metrics.children_rss_peak_bytes)
+            self.rss_peak_bytes = max(self.rss_peak_bytes, metrics.rss_peak_bytes)
+
+            partial = self.prom_path + ".tmp"
+            with open(partial, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(partial, self.prom_path)
+
+    def prometheus_text(self):
+        """Current totals; callers hold self.lock."""
+        lines = [
+            "# HELP rivl_render_jobs_total Render jobs finished, by status.",
+            "# TYPE rivl_render_jobs_total counter",
+        ]
+        lines += [f'rivl_render_jobs_total{{status="{status}"}} {count}'
+                  for status, count in sorted(self.jobs.items())]
+        lines += [
+            "# HELP rivl_render_stage_seconds_total Wall time spent per render stage.",
+            "# TYPE rivl_render_stage_seconds_total counter",
+        ]
+        lines += [f'rivl_render_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}'
+                  for stage, seconds in sorted(self.stage_seconds.items())]
+        for name, amount in sorted(self.counters.items()):
+            lines += [f"# TYPE rivl_render_{name}_total counter",
+                      f"rivl_render_{name}_total {amount}"]
+        lines += [
+            "# HELP rivl_render_queue_wait_seconds Time jobs waited for a worker.",
+            "# TYPE rivl_render_queue_wait_seconds summary",
+            f"rivl_render_queue_wait_seconds_sum {self.queue_wait[0]:.6f}",
+            f"rivl_render_queue_wait_seconds_count {self.queue_wait[1]}",
+            "# HELP rivl_render_job_seconds Wall time of render jobs.",
+            "# TYPE rivl_render_job_seconds summary",
+            f"rivl_render_job_seconds_sum {self.job_seconds[0]:.6f}",
+            f"rivl_render_job_seconds_count {self.job_seconds[1]}",
+            "# HELP rivl_render_ffmpeg_cpu_seconds_total CPU time of the ffmpeg processes of render jobs.",
+            "# TYPE rivl_render_ffmpeg_cpu_seconds_total counter",
+            f"rivl_render_ffmpeg_cpu_seconds_total {self.ffmpeg_cpu_seconds:.6f}",
+            "# HELP rivl_render_ffmpeg_rss_peak_bytes Highest resident set size of one ffmpeg process.",
+            "# TYPE rivl_render_ffmpeg_rss_peak_bytes gauge",
+            f"rivl_render_ffmpeg_rss_peak_bytes {self.ffmpeg_rss_peak_bytes}",
+            "# HELP rivl_render_rss_peak_bytes Highest resident set size sampled during a job.",
+            "# TYPE rivl_render_rss_peak_bytes gauge",
+            f"rivl_render_rss_peak_bytes {self.rss_peak_bytes}",
+            "# HELP rivl_process_cpu_seconds_total CPU time of this process.",
+            "# TYPE rivl_process_cpu_seconds_total counter",
+            f"rivl_process_cpu_seconds_total {cpu_seconds():.6f}",
+        ]
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines += [
+                "# HELP rivl_process_rss_peak_bytes Lifetime peak resident set size of this process.",
+                "# TYPE rivl_process_rss_peak_bytes gauge",
+                f"rivl_process_rss_peak_bytes {peak}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class RenderCancelled(RuntimeError):
+    pass
+
+
+class OfflineRenderer:
+    """Decode -> composite -> encode pipeline behind the Render button.
+
+    Frames are piped through ffmpeg as raw RGBA and composited with
+    TiledFrameCompositor, so rendering never touches the GUI thread.
+
+    The video is rendered as short segments stored in a content-addressed
+    cache. A segment's key covers the source hash, its frame range and the
+    overlay state of each of its frames, so a settings change re-renders
+    only the segments it actually alters. Segments are then concatenated
+    and muxed with the source audio, and the cache is trimmed to
+    RENDER_CACHE_MAX_BYTES, least recently used first.
+    """
+
+    ENCODER_ARGS = ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+
+    def __init__(self, source_path, logo_image, output_path, timing=None,
+                 compositor=None, progress=None, verifier=None, audio_gain_db=0.0,
+                 audio_standard=None, settings=None, cache_dir=RENDER_CACHE, metrics=None,
+                 overlay_fraction=None):
+        self.source_path = source_path
+        self.logo_image = logo_image
+        self.overlay_fraction = overlay_fraction
+        self.output_path = output_path
+        self.timing = timing or OverlayTiming()
+        self.compositor = compositor or TiledFrameCompositor()
+        self.progress = progress
+        self.verifier = verifier
+        self.verification = None
+        self.audio_gain_db = audio_gain_db
+        self.audio_standard = audio_standard
+        self.settings = settings or {}
+        self.cache_dir = cache_dir
+        self.reused_segments = 0
+        self.loudness_shortfall_db = 0.0
+        self.cancelled = threading.Event()
+        self.concat_process = None
+        self.metrics = metrics or RenderMetrics(os.path.basename(output_path))
+
+    def fit_logo(self, width, height):
+        """Size the logo as the preview showed it: the same fraction of the frame width."""
+        logo = self.logo_image
+        if logo.isNull():
+            raise RuntimeError("Overlay image could not be loaded")
+        if self.overlay_fraction:
+            logo = logo.scaledToWidth(
+                max(1, round(width * self.overlay_fraction)),
+                Qt.TransformationMode.SmoothTransformation
+            )
+            return qimage_to_array(logo)
+
+        # Without a recorded fraction, fall back to the preview's 50% cap
+        max_width, max_height = width * 0.5, height * 0.5
+        if logo.width() > max_width or logo.height() > max_height:
+            logo = logo.scaled(
+                int(max_width), int(max_height),
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation
+            )
+        return qimage_to_array(logo)
+
+    def cancel(self):
+        """Stop the render from another thread; render() then raises RenderCancelled."""
+        self.cancelled.set()
+        if self.concat_process and self.concat_process.poll() is None:
+            self.concat_process.terminate()
+
+    def segment_key(self, source_hash, logo_hash, start, end, fps, to_eof=False):
+        states = [self.timing.state_at(index / fps) for index in range(start, end)]
+        parts = {
+            "pipeline": [PIPELINE_VERSION, MASK_REFRESH_MS, SEGMENT_MASK_REFRESHES],
+            "source": source_hash,
+            "range": [start, end],
+            "to_eof": to_eof,
+            "fps": fps,
+            "encoder": self.ENCODER_ARGS,
+            "states": [None if state is None else [round(v, 6) for v in state]
+                       for state in states],
+        }
+        # Frames without the overlay depend on the source alone
+        if any(state is not None for state in states):
+            parts["logo"] = logo_hash
+            parts["settings"] = self.settings
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def render(self):
+        self.metrics.start()
+        status = "failed"
+        try:
+            rendered = self.render_segments()
+            status = "ok"
+            return rendered
+        finally:
+            self.metrics.finish(status)
+
+    def render_segments(self):
+        metrics = self.metrics
+        with metrics.stage("probe"):
+            width, height, fps, duration = probe_video(self.source_path)
+            logo = self.fit_logo(width, height)
+            total_frames = max(1, count_frames(self.source_path, fps, duration))
+        refresh_frames = max(1, round(fps * MASK_REFRESH_MS / 1000))
+        segment_frames = refresh_frames * SEGMENT_MASK_REFRESHES
+
+        with metrics.stage("hash"):
+            source_hash = file_digest(self.source_path)
+        logo_hash = hashlib.sha256(str(logo.shape).encode() + logo.tobytes()).hexdigest()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        segments = []
+        for start in range(0, total_frames, segment_frames):
+            end = min(start + segment_frames, total_frames)
+            # The last segment runs to the decoder's EOF, whatever the count said
+            key = self.segment_key(source_hash, logo_hash, start, end, fps,
+                                   to_eof=end == total_frames)
+            segments.append((start, end, os.path.join(self.cache_dir, key + ".mp4")))
+
+        missing = []
+        for segment in segments:
+            if os.path.exists(segment[2]):
+                os.utime(segment[2])  # Marks the segment recently used
+            else:
+                missing.append(segment)
+        self.reused_segments = len(segments) - len(missing)
+        metrics.count("segments_reused", self.reused_segments)
+
+        # Decode each run of consecutive missing segments in one pass
+        runs = []
+        for segment in missing:
+            if runs and runs[-1][-1][1] == segment[0]:
+                runs[-1].append(segment)
+            else:
+                runs.append([segment])
+
+        self.frames_to_render = max(1, sum(end - start for start, end, _ in missing))
+        self.frames_rendered = 0
+        rendered = []
+        for run in runs:
+            rendered += self.render_run(run, logo, width, height, fps, refresh_frames,
+                                        total_frames)
+
+        if self.audio_standard:
+            # Measurements are cached per file, so this rarely decodes
+            with metrics.stage("loudness"):
+                loudness = analyze_loudness(self.source_path, cancel=self.cancelled)
+            self.audio_gain_db = normalization_gain(loudness, self.audio_standard)
+            self.loudness_shortfall_db = normalization_shortfall(loudness, self.audio_standard)
+        with metrics.stage("concat"):
+            self.concat([path for _, _, path in segments if os.path.exists(path)])
+        prune_render_cache(self.cache_dir, {path for _, _, path in segments})
+
+        if self.verifier:
+            # Always the decoded output, so cache hits cannot change what is compared
+            with metrics.stage("verify"):
+                self.verifier.sample_file(self.output_path)
+                self.verification = self.verifier.finish()
+        return rendered
+
+    def render_run(self, run, logo, width, height, fps, refresh_frames, total_frames):
+        metrics = self.metrics
+        clock = time.perf_counter
+        white = self.compositor.white_version(logo)
+        center = (width / 2, height / 2)
+        first, last = run[0][0], run[-1][1]
+
+        frame_limit = []
+        if last < total_frames:
+            frame_limit = ["-frames:v", str(last - first)]
+        decoder = subprocess.Popen(
+            ["ffmpeg", "-v", "error", "-ss", f"{max(0.0, (first - 0.5) / fps):.6f}",
+             "-i", self.source_path, *frame_limit,
+             "-f", "rawvideo", "-pix_fmt", "rgba", "-"],
+            stdout=subprocess.PIPE
+        )
+
+        frame = np.empty((height, width, 4), dtype=np.uint8)
+        buffer = memoryview(frame).cast("B")
+        masked = masked_window = None
+        rendered = []
+        try:
+            for start, end, path in run:
+                # Unique per job, so concurrent renders of a segment never share a file
+                partial = f"{path[:-len('.mp4')]}.{os.getpid()}.{threading.get_ident()}.part.mp4"
+                encoder = subprocess.Popen(
+                    ["ffmpeg", "-y", "-v", "error",
+                     "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}",
+                     "-r", f"{fps}", "-i", "-", *self.ENCODER_ARGS, partial],
+                    stdin=subprocess.PIPE
+                )
+                written = 0
+                if end == total_frames:
+                    indices = itertools.count(start)
+                else:
+                    indices = range(start, end)
+                try:
+                    for index in indices:
+                        if self.cancelled.is_set():
+                            raise RenderCancelled("Render cancelled")
+                        started = clock()
+                        if decoder.stdout.readinto(buffer) != len(buffer):
+                            break
+                        decoded = clock()
+                        metrics.add_time("decode", decoded - started)
+
+                        state = self.timing.state_at(index / fps)
+                        if state is not None:
+                            # Re-mask once per refresh window, on the window's
+                            # first visible frame; hidden frames need no mask
+                            if masked_window != index // refresh_frames:
+                                masked = self.compositor.mask_destination_in(frame, logo)
+                                masked_window = index // refresh_frames
+                            scale_progress, white_fraction, opacity = state
+                            self.compositor.composite_overlay(
+                                frame, masked, white, center,
+                                overlay_scale(scale_progress), white_fraction, opacity
+                            )
+
+                        composited = clock()
+                        metrics.add_time("composite", composited - decoded)
+
+                        encoder.stdin.write(buffer)
+                        metrics.add_time("encode", clock() - composited)
+                        written += 1
+                        self.frames_rendered += 1
+                        if self.progress:
+                            self.progress(min(100, self.frames_rendered * 100 // self.frames_to_render))
+                finally:
+                    flushing = clock()
+                    encoder.stdin.close()
+                    wait_with_usage(encoder, metrics)
+                    metrics.add_time("encode", clock() - flushing)
+                    metrics.count("frames_rendered", written)
+
+                if written == 0:
+                    # Source ended early; nothing left worth caching
+                    if os.path.exists(partial):
+                        os.remove(partial)
+                    break
+                if encoder.returncode != 0:
+                    raise RuntimeError(f"ffmpeg failed while rendering {self.source_path}")
+                os.replace(partial, path)
+                rendered.append(path)
+                metrics.count("segments_rendered")
+        finally:
+            decoder.stdout.close()
+            wait_with_usage(decoder, metrics)
+
+        if decoder.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed while decoding {self.source_path}")
+        return rendered
+
+    def concat(self, segment_paths):
+        # Loudness normalization rides along with the audio transcode
+        audio_filter = []
+        if self.audio_gain_db:
+            audio_filter = ["-af", f"volume={self.audio_gain_db:.2f}dB"]
+
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+            for path in segment_paths:
+                listing.write(f"file '{path}'\n")
+        command = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0",
+                   "-i", listing.name, "-i", self.source_path,
+                   "-map", "0:v", "-map", "1:a?", "-c:v", "copy",
+                   *audio_filter, "-c:a", "aac", "-shortest", self.output_path]
+        try:
+            if self.cancelled.is_set():
+                raise RenderCancelled("Render cancelled")
+            self.concat_process = subprocess.Popen(command)
+            if wait_with_usage(self.concat_process, self.metrics) != 0:
+                if self.cancelled.is_set():
+                    raise RenderCancelled("Render cancelled")
+                raise subprocess.CalledProcessError(1, command)
+        finally:
+            os.remove(listing.name)
+
+
+# Delivery standards: (target integrated loudness in LUFS, max true peak in dBTP)
+LOUDNESS_STANDARDS = {
+    "EBU R128": (-23.0, -1.0),
+    "ATSC A/85": (-24.0, -2.0),
+}
+
+LOUDNESS_CACHE = os.path.join(CACHE_DIR, "loudness.json")
+
+
+# BS.1770 channel weights in ffmpeg's channel order: fronts 1.0,
+# surrounds 1.41 (+1.5 dB), LFE excluded
+CHANNEL_WEIGHTS = {
+    "mono": [1.0],
+    "stereo": [1.0, 1.0],
+    "2.1": [1.0, 1.0, 0.0],
+    "3.0": [1.0, 1.0, 1.0],
+    "quad": [1.0, 1.0, 1.41, 1.41],
+    "5.0": [1.0, 1.0, 1.0, 1.41, 1.41],
+    "5.0(side)": [1.0, 1.0, 1.0, 1.41, 1.41],
+    "5.1": [1.0, 1.0, 1.0, 0.0, 1.41, 1.41],
+    "5.1(side)": [1.0, 1.0, 1.0, 0.0, 1.41, 1.41],
+    "7.1": [1.0, 1.0, 1.0, 0.0, 1.41, 1.41, 1.41, 1.41],
+    "7.1(wide)": [1.0, 1.0, 1.0, 0.0, 1.41, 1.41, 1.0, 1.0],
+}
+
+
+def probe_audio(path):
+    """Return (channels, channel_weights) of the first audio stream."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=channels,channel_layout", "-of", "json", path],
+        capture_output=True, text=True, check=True
+    )
+    streams = json.loads(result.stdout).get("streams")
+    if not streams:
+        raise RuntimeError(f"No audio stream in {path}")
+    channels = int(streams[0]["channels"])
+    weights = CHANNEL_WEIGHTS.get(streams[0].get("channel_layout"))
+    if weights is None or len(weights) != channels:
+        weights = [1.0] * channels
+    return channels, weights
+
+
+class LoudnessMeter:
+    """ITU-R BS.1770 loudness meter for 48 kHz float audio in fixed-size chunks.
+
+    measure() handles one chunk on its own, so chunks can be measured on
+    several threads. Each chunk is K-weighted after a short warm-up on the
+    audio just before it; the filter's memory is a few milliseconds, so
+    this matches one continuous pass. Chunks reduce to weighted 100 ms
+    mean-square sub-blocks, from which the 400 ms (momentary) and 3 s
+    (short-term) windows are built. True peak uses a 4x polyphase
+    interpolator evaluated only around the loudest samples.
+    """
+
+    SAMPLE_RATE = 48000
+    SUB_BLOCK = SAMPLE_RATE // 10
+    WARMUP = SAMPLE_RATE // 10
+    # Interpolation windows evaluated at a time by the true-peak search
+    TRUE_PEAK_BLOCK = 8192
+    K_WEIGHTING = np.array([
+        [1.53512485958697, -2.69169618940638, 1.19839281085285,
+         1.0, -1.69065929318241, 0.73248077421585],
+        [1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621],
+    ])
+
+    def __init__(self, channels=2, weights=None):
+        self.channels = channels
+        self.weights = np.array(weights or [1.0] * channels)
+        self.energies = []
+        self.sample_peak = 0.0
+        self.true_peak = 0.0
+
+        # 48-tap interpolator split into 4 phases of 12 taps
+        taps = firwin(48, 0.25) * 4
+        self.phases = taps.reshape(12, 4).T[:, ::-1].astype(np.float32)
+
+    def true_peak_of(self, context, samples, chunk_peak):
+        if chunk_peak == 0:
+            return 0.0
+        taps = self.phases.shape[1]
+        context = np.concatenate([context[len(context) - taps + 1:], samples])
+        windows = np.lib.stride_tricks.sliding_window_view(context, taps, axis=0)
+
+        # An intersample peak sits next to a sample no more than 6 dB below
+        # it, so only windows whose two centre samples reach that are
+        # evaluated. Blocks bound memory; dense blocks skip the gather.
+        threshold = 0.5 * chunk_peak
+        peak = chunk_peak
+        for first in range(0, len(windows), self.TRUE_PEAK_BLOCK):
+            block = windows[first:first + self.TRUE_PEAK_BLOCK]
+            centre = block[:, :, taps // 2 - 1:taps // 2 + 1]
+            hot = (np.abs(centre) >= threshold).any(axis=2)
+            candidates = np.count_nonzero(hot)
+            if candidates == 0:
+                continue
+            if candidates > hot.size // 4:
+                values = block @ self.phases.T
+            else:
+                rows, chans = np.nonzero(hot)
+                values = block[rows, chans] @ self.phases.T
+            peak = max(peak, float(np.abs(values).max()))
+        return peak
+
+    def measure(self, context, samples):
+        """Measure one chunk; context is the audio just before it (empty for the first)."""
+        warmup = context[len(context) - self.WARMUP:]
+        filtered = sosfilt(self.K_WEIGHTING, np.concatenate([warmup, samples]), axis=0)
+        filtered = filtered[len(warmup):]
+
+        whole = len(samples) // self.SUB_BLOCK * self.SUB_BLOCK
+        weighted = (filtered[:whole] * filtered[:whole]) @ self.weights
+        energies = weighted.reshape(-1, self.SUB_BLOCK).mean(axis=1)
+
+        chunk_peak = float(np.abs(samples).max(initial=0.0))
+        return energies, chunk_peak, self.true_peak_of(context, samples, chunk_peak)
+
+    def add(self, measurement):
+        energies, sample_peak, true_peak = measurement
+        self.energies.append(energies)
+        self.sample_peak = max(self.sample_peak, sample_peak)
+        self.true_peak = max(self.true_peak, true_peak)
+
+    @staticmethod
+    def _lufs(energy):
+        return -0.691 + 10 * np.log10(np.maximum(energy, 1e-12))
+
+    def result(self):
+        sub_blocks = np.concatenate(self.energies) if self.energies else np.empty(0)
+        sums = np.concatenate([[0.0], np.cumsum(sub_blocks)])
+        momentary = (sums[4:] - sums[:-4]) / 4
+        short_term = (sums[30:] - sums[:-30]) / 30
+
+        # Absolute gate at -70 LUFS, then relative gate 10 LU below
+        integrated = None
+        gated = momentary[self._lufs(momentary) > -70]
+        if len(gated):
+            relative = self._lufs(gated.mean()) - 10
+            gated = gated[self._lufs(gated) > relative]
+            integrated = float(self._lufs(gated.mean()))
+
+        return {
+            "integrated": integrated,
+            "short_term_max": float(self._lufs(short_term.max())) if len(short_term) else None,
+            "true_peak": float(20 * np.log10(max(self.true_peak, self.sample_peak, 1e-9))),
+        }
+
+
+def analyze_loudness(path, chunk_s=10, cache_path=LOUDNESS_CACHE, workers=None, cancel=None):
+    """Measure the loudness of path, decoding in bounded chunks; cached per file.
+
+    Chunks are measured on a thread pool while ffmpeg decodes ahead; at most
+    two chunks per worker are in flight, and each measurement works in
+    fixed-size blocks, which bounds memory. Setting the cancel event stops
+    the analysis between chunks with a RuntimeError.
+    """
+    # The suffix invalidates measurements taken before native-layout weighting
+    key = file_cache_key(path) + "|bs1770"
+    cached = load_json_cache(cache_path).get(key)
+    if cached is not None:
+        return cached
+
+    if sosfilt is None:
+        raise RuntimeError("Loudness analysis requires SciPy")
+
+    channels, weights = probe_audio(path)
+    meter = LoudnessMeter(channels, weights)
+    workers = workers or os.cpu_count() or 1
+    decoder = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", path, "-vn",
+         "-ar", str(meter.SAMPLE_RATE), "-f", "f32le", "-"],
+        stdout=subprocess.PIPE
+    )
+    # Chunks are whole sub-blocks so each one yields complete 100 ms energies
+    chunk_frames = meter.SAMPLE_RATE * chunk_s // meter.SUB_BLOCK * meter.SUB_BLOCK
+    frame_bytes = 4 * channels
+    context = np.zeros((0, channels), dtype=np.float32)
+    in_flight = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError("Loudness analysis cancelled")
+                chunk = np.empty((chunk_frames, channels), dtype=np.float32)
+                read = decoder.stdout.readinto(memoryview(chunk).cast("B"))
+                if not read:
+                    break
+                chunk = chunk[:read // frame_bytes]
+                in_flight.append(pool.submit(meter.measure, context, chunk))
+                context = chunk
+                if len(in_flight) >= workers * 2:
+                    meter.add(in_flight.pop(0).result())
+            for future in in_flight:
+                meter.add(future.result())
+    finally:
+        if cancel is not None and cancel.is_set():
+            decoder.terminate()
+        decoder.stdout.close()
+        decoder.wait()
+    if decoder.returncode != 0:
+        raise RuntimeError(f"Could not decode audio from {path}")
+
+    return update_json_cache(cache_path, key, meter.result())
+
+
+def normalization_gain(loudness, standard):
+    """Gain in dB that brings loudness to the standard's target without exceeding its true-peak limit."""
+    target, max_true_peak = LOUDNESS_STANDARDS[standard]
+    if loudness["integrated"] is None:
+        return 0.0
+    return min(target - loudness["integrated"], max_true_peak - loudness["true_peak"])
+
+
+def normalization_shortfall(loudness, standard):
+    """How many dB short of the standard's target the true-peak limit leaves the output."""
+    if loudness["integrated"] is None:
+        return 0.0
+    target = LOUDNESS_STANDARDS[standard][0]
+    return target - (loudness["integrated"] + normalization_gain(loudness, standard))
+
+
+def write_project(path, project):
+    """Save a project; source and overlay paths are stored relative to the project file."""
+    base = os.path.dirname(os.path.abspath(path))
+    project = dict(project)
+    for field in ("source", "overlay"):
+        if project[field]:
+            try:
+                project[field] = os.path.relpath(os.path.abspath(project[field]), base)
+            except ValueError:  # Different drive on Windows
+                project[field] = os.path.abspath(project[field])
+    os.makedirs(base, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(project, f, indent=2)
+
+
+def read_project(path):
+    with open(path) as f:
+        project = json.load(f)
+    if project.get("version") != PROJECT_VERSION:
+        raise ValueError(f"Unsupported project version {project.get('version')}")
+    base = os.path.dirname(os.path.abspath(path))
+    for field in ("source", "overlay"):
+        if project[field]:
+            project[field] = os.path.normpath(os.path.join(base, project[field]))
+    # Projects saved before overlay sizing was recorded fall back to the 50% cap
+    project.setdefault("overlay_fraction", None)
+    return project
+
+
+def extract_frame(path, pos_s, width, height):
+    """Decode the frame at pos_s as an H x W x 4 RGBA uint8 array, or None past the end."""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-ss", f"{pos_s:.3f}", "-i", path,
+         "-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "rgba", "-"],
+        capture_output=True, check=True
+    )
+    if len(result.stdout) < width * height * 4:
+        return None
+    return np.frombuffer(result.stdout, np.uint8, width * height * 4).reshape(height, width, 4)
+
+
+def block_means(plane, rows, cols):
+    """Area average of plane over a rows x cols grid of (nearly) equal blocks."""
+    height, width = plane.shape[:2]
+    ys = np.linspace(0, height, rows + 1).astype(int)
+    xs = np.linspace(0, width, cols + 1).astype(int)
+    # Summing whole row bands walks contiguous memory; integer sums avoid a float copy
+    dtype = np.uint32 if plane.dtype.kind in "ui" else np.float64
+    bands = np.stack([plane[y0:y1].sum(axis=0, dtype=dtype) for y0, y1 in zip(ys[:-1], ys[1:])])
+    sums = np.add.reduceat(bands, xs[:-1], axis=1)
+    counts = np.outer(np.diff(ys), np.diff(xs))
+    if sums.ndim == 3:
+        counts = counts[..., None]
+    return sums / counts
+
+
+def perceptual_hash(frame, hash_size=8):
+    """64-bit difference hash of the frame's luma, as a hex string."""
+    # Luma is linear, so averaging RGB first gives the same block luma
+    means = block_means(frame, hash_size, hash_size + 1)[..., :3] @ np.array([0.299, 0.587, 0.114])
+    bits = (means[:, 1:] > means[:, :-1]).ravel()
+    return np.packbits(bits).tobytes().hex()
+
+
+def region_signature(frame, grid=4):
+    """Mean RGB of each cell of a grid x grid split, rounded to ints."""
+    means = block_means(frame, grid, grid)[..., :3]
+    return np.rint(means).astype(int).tolist()
+
+
+def golden_reference_path(source_path, preset, overlay_path):
+    """Golden references live next to the source, one per source, preset and overlay."""
+    source_dir, source_name = os.path.split(os.path.abspath(source_path))
+    preset_slug = re.sub(r"[^a-z0-9]+", "-", preset.lower()).strip("-")
+    name = f"{os.path.splitext(source_name)[0]}.{preset_slug}.{file_digest(overlay_path)[:12]}.json"
+    return os.path.join(source_dir, "golden", name)
+
+
+class GoldenFrameMismatch(RuntimeError):
+    pass
+
+
+class GoldenFrameVerifier:
+    """Checks key frames of a render against a stored golden reference.
+
+    Frames are sampled at the start, hold, mid-fade and end of the overlay
+    animation, always from the finished, decoded file (sample_file), so a
+    golden recorded on one render compares like with like on the next.
+    Each sample is reduced to a perceptual hash plus per-region mean colours.
+    """
+
+    def __init__(self, golden_path, timing=None, max_hamming=6, region_tolerance=8):
+        self.golden_path = golden_path
+        self.timing = timing or OverlayTiming()
+        self.max_hamming = max_hamming
+        self.region_tolerance = region_tolerance
+        self.golden = None
+        if os.path.exists(golden_path):
+            with open(golden_path) as f:
+                self.golden = json.load(f)
+        self.samples = {}
+
+    def sample_times(self):
+        if self.golden:
+            return self.golden["timestamps"]
+        timing = self.timing
+        return {
+            "start": 0.0,
+            "hold": (timing.intro_end + timing.fade_start) / 2,
+            "fade_mid": (timing.fade_start + timing.fade_end) / 2,
+            "fade_end": timing.fade_end,
+        }
+
+    @staticmethod
+    def signature(frame):
+        return {"phash": perceptual_hash(frame), "regions": region_signature(frame)}
+
+    def sample_file(self, path):
+        width, height, _, _ = probe_video(path)
+        for name, sample_s in self.sample_times().items():
+            if name in self.samples:
+                continue
+            frame = extract_frame(path, sample_s, width, height)
+            if frame is not None:
+                self.samples[name] = self.signature(frame)
+
+    def record(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.golden_path)), exist_ok=True)
+        with open(self.golden_path, "w") as f:
+            json.dump({"timestamps": self.sample_times(), "frames": self.samples}, f, indent=2)
+        self.golden = {"timestamps": self.sample_times(), "frames": self.samples}
+        return "recorded"
+
+    def verify(self):
+        if not self.golden:
+            raise GoldenFrameMismatch(f"No golden reference at {self.golden_path}")
+
+        problems = []
+        for name, expected in self.golden["frames"].items():
+            actual = self.samples.get(name)
+            if actual is None:
+                problems.append(f"{name}: frame missing")
+                continue
+            distance = bin(int(expected["phash"], 16) ^ int(actual["phash"], 16)).count("1")
+            if distance > self.max_hamming:
+                problems.append(f"{name}: hash distance {distance}")
+            drift = np.abs(np.array(expected["regions"]) - np.array(actual["regions"])).max()
+            if drift > self.region_tolerance:
+                problems.append(f"{name}: region drift {drift}")
+
+        if problems:
+            raise GoldenFrameMismatch("Golden frame check failed: " + "; ".join(problems))
+        return "verified"
+
+    def finish(self):
+        """Verify against the golden reference; recording a missing one is left to the caller."""
+        return self.verify() if self.golden else "missing"
+
+
+def verify_renders(argv):
+    """Batch entry point: check finished renders against their golden references."""
+    parser = argparse.ArgumentParser(prog="RIVL.py")
+    parser.add_argument("--verify", nargs=2, action="append", required=True,
+                        metavar=("GOLDEN", "RENDER"))
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for golden_path, render_path in args.verify:
+        verifier = GoldenFrameVerifier(golden_path)
+        verifier.sample_file(render_path)
+        try:
+            status = verifier.record() if args.update_golden else verifier.verify()
+        except GoldenFrameMismatch as e:
+            failures += 1
+            print(f"FAIL {render_path}: {e}")
+        else:
+            print(f"{status} {render_path}")
+    return 1 if failures else 0
+
+
+def render_headless(argv):
+    """Batch entry point: render projects without a window, exporting job metrics."""
+    parser = argparse.ArgumentParser(prog="RIVL.py")
+    parser.add_argument("--render", nargs=2, action="append", required=True,
+                        metavar=("PROJECT", "OUTPUT"))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--metrics-dir", default=METRICS_DIR)
+    parser.add_argument("--metrics-port", type=int)
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args(argv)
+
+    exporter = MetricsExporter(args.metrics_dir, port=args.metrics_port)
+    compositor = TiledFrameCompositor()
+
+    def run(renderer):
+        try:
+            try:
+                renderer.render()
+            except GoldenFrameMismatch:
+                if not args.update_golden:
+                    raise
+            if args.update_golden and renderer.verification != "verified":
+                renderer.verification = renderer.verifier.record()
+        except Exception as e:  # One bad job must not abort the batch
+            print(f"FAIL {renderer.output_path}: {e or type(e).__name__}")
+            return False
+        else:
+            print(f"ok {renderer.output_path} (golden frames {renderer.verification})")
+            if renderer.loudness_shortfall_db > 0.1:
+                print(f"  {renderer.loudness_shortfall_db:.1f} dB below the "
+                      f"{renderer.audio_standard} target (true-peak limit)")
+            return True
+        finally:
+            try:
+                exporter.record(renderer.metrics)
+            except OSError as e:
+                print(f"Could not export render metrics: {e}")
+
+    failures = 0
+    try:
+        # Renderers are created at submission so queue wait is measured
+        with ThreadPoolExecutor(max_workers=args.workers) as jobs:
+            futures = []
+            for project_path, output_path in args.render:
+                try:
+                    project = read_project(project_path)
+                    if not project["source"] or not project["overlay"]:
+                        raise ValueError("project has no source video or overlay")
+                    overlay = QImage(project["overlay"])
+                    if overlay.isNull():
+                        raise ValueError(f"overlay {project['overlay']} could not be loaded")
+                    timing = OverlayTiming(**project["timing"])
+                    verifier = GoldenFrameVerifier(
+                        golden_reference_path(project["source"], project["settings"]["animation"],
+                                              project["overlay"]),
+                        timing=timing
+                    )
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"FAIL {project_path}: {e}")
+                    failures += 1
+                    continue
+                renderer = OfflineRenderer(
+                    project["source"], overlay, output_path,
+                    timing=timing, compositor=compositor, verifier=verifier,
+                    audio_standard=project["audio_standard"], settings=project["settings"],
+                    overlay_fraction=project["overlay_fraction"]
+                )
+                futures.append(jobs.submit(run, renderer))
+            failures += sum(not future.result() for future in futures)
+    finally:
+        compositor.close()
+        exporter.close()
+    return 1 if failures else 0
+
+
+class RenderWorker(QThread):
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    succeeded = pyqtSignal(str)
+
+    def __init__(self, renderer, exporter=None):
+        super().__init__()
+        self.renderer = renderer
+        self.renderer.progress = self.progress.emit
+        self.exporter = exporter
+        self.error = None
+
+    def cancel(self):
+        self.renderer.cancel()
+
+    def run(self):
+        try:
+            self.renderer.render()
+        except Exception as e:  # An escaping exception would abort the app
+            self.error = e
+            self.failed.emit(str(e) or type(e).__name__)
+        else:
+            message = self.renderer.output_path
+            if self.renderer.reused_segments:
+                message += f" ({self.renderer.reused_segments} cached segments reused)"
+            if self.renderer.verification:
+                message += f" (golden frames {self.renderer.verification})"
+            self.succeeded.emit(message)
+        finally:
+            self.renderer.compositor.close()
+            if self.exporter:
+                try:
+                    self.exporter.record(self.renderer.metrics)
+                except OSError as e:
+                    print(f"Could not export render metrics: {e}")
+
+
+
+
+class LoudnessWorker(QThread):
+    failed = pyqtSignal(str)
+    succeeded = pyqtSignal(dict)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            loudness = analyze_loudness(self.path, cancel=self.cancelled)
+        except Exception as e:  # An escaping exception would abort the app
+            self.failed.emit(str(e) or type(e).__name__)
+        else:
+            self.succeeded.emit(loudness)
 
 
 
@@ -96,6 +1691,7 @@ class AudiTVCApp(QWidget):
         self.media_player = QMediaPlayer()
         self.video_item = QGraphicsVideoItem()
         self.media_player.setVideoOutput(self.video_item)
+        self.video_item.nativeSizeChanged.connect(lambda size: self.fit_video_view())
         
         # Create graphics scene
         self.scene = QGraphicsScene(self)
@@ -112,6 +1708,27 @@ class AudiTVCApp(QWidget):
         self.video_loaded = False
         self.overlay_item = None
         self.video_duration_s = 0
+        self.video_path = None
+        self.overlay_path = None
+        self.overlay_fraction = None
+        # (path, fraction) of a project overlay waiting for the video's size
+        self.pending_overlay = None
+        self.overlay_timing = OverlayTiming()
+        self.render_worker = None
+        self.metrics_exporter = None
+        try:
+            self.metrics_exporter = MetricsExporter()
+        except OSError as e:
+            print(f"Render metrics disabled: {e}")
+        self.loudness_worker = None
+        self.audio_standard = None
+
+        # Adaptive preview quality
+        self.preview_governor = PreviewGovernor(budget_ms=self.timer.interval())
+        self.preview_transform_mode = Qt.TransformationMode.SmoothTransformation
+        self.low_res_surface = False
+        self.mask_refresh_enabled = True
+        self.last_mask_refresh = 0.0
 
         # UI setup
         self.stack = QStackedLayout(self)
@@ -125,6 +1742,13 @@ class AudiTVCApp(QWidget):
         self.media_player.positionChanged.connect(self.update_position)
         self.media_player.playbackStateChanged.connect(self.update_play_button)
 
+        # Panel settings from the last session
+        if os.path.exists(SESSION_PATH):
+            try:
+                self.apply_project(read_project(SESSION_PATH), load_sources=False)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Could not restore session: {e}")
+
     def handle_player_error(self, error, error_string):
         QMessageBox.warning(self, "Error", 
                           f"Cannot play video: {error_string}\n\n"
@@ -266,7 +1890,7 @@ class AudiTVCApp(QWidget):
         self.video_container.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
         # Graphics View for video and overlays
-        self.video_view = QGraphicsView(self.scene)
+        self.video_view = TimedGraphicsView(self.scene)
         self.video_view.setStyleSheet("background: black; border: none;")
         self.video_view.setRenderHints(
             QPainter.RenderHint.Antialiasing | 
@@ -276,6 +1900,14 @@ class AudiTVCApp(QWidget):
         right_wrapper.addWidget(self.video_container)
         self.video_container.setLayout(QVBoxLayout())
         self.video_container.layout().addWidget(self.video_view)
+
+        # Offscreen low-res preview, shown instead of the view under heavy load
+        self.low_res_label = QLabel()
+        self.low_res_label.setScaledContents(True)
+        self.low_res_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.low_res_label.setVisible(False)
+        self.video_container.layout().addWidget(self.low_res_label)
+
         self.build_media_controls(right_wrapper)
         layout.addLayout(right_wrapper)
         return screen
@@ -316,6 +1948,13 @@ class AudiTVCApp(QWidget):
             if self.overlay_item:
                 self.center_overlay_item()
 
+            # A size from the previous source does not count while loading
+            loading = self.media_player.mediaStatus() == QMediaPlayer.MediaStatus.LoadingMedia
+            if self.pending_overlay and not loading:
+                path, fraction = self.pending_overlay
+                self.pending_overlay = None
+                self.set_overlay(path, fraction)
+
 
     def resize_video_and_overlay(self, event):
         """Handle window resize events"""
@@ -461,20 +2100,38 @@ class AudiTVCApp(QWidget):
         layout.addLayout(timing_layout)
         layout.addSpacing(20)
 
+        # Project buttons
+        project_layout = QHBoxLayout()
+        open_project_btn = QPushButton("Open Project")
+        open_project_btn.setStyleSheet(self.button_style())
+        open_project_btn.clicked.connect(self.open_project_dialog)
+        save_project_btn = QPushButton("Save Project")
+        save_project_btn.setStyleSheet(self.button_style())
+        save_project_btn.clicked.connect(self.save_project_dialog)
+
+        project_layout.addWidget(open_project_btn)
+        project_layout.addSpacing(10)
+        project_layout.addWidget(save_project_btn)
+
+        layout.addLayout(project_layout)
+        layout.addSpacing(10)
+
         # Render button
-        render_button = QPushButton("Render")
-        render_button.setStyleSheet(self.button_style())
-        layout.addWidget(render_button)
+        self.render_button = QPushButton("Render")
+        self.render_button.setStyleSheet(self.button_style())
+        self.render_button.clicked.connect(self.start_render)
+        layout.addWidget(self.render_button)
         layout.addStretch()
 
         # Bottom buttons
         bottom_layout = QHBoxLayout()
-        audio_btn = QPushButton("Audio Setup")
-        audio_btn.setStyleSheet(self.button_style())
+        self.audio_btn = QPushButton("Audio Setup")
+        self.audio_btn.setStyleSheet(self.button_style())
+        self.audio_btn.clicked.connect(self.open_audio_setup)
         help_btn = QPushButton("Help")
         help_btn.setStyleSheet(self.button_style())
         
-        bottom_layout.addWidget(audio_btn)
+        bottom_layout.addWidget(self.audio_btn)
         bottom_layout.addSpacing(10)
         bottom_layout.addWidget(help_btn)
         
@@ -502,6 +2159,9 @@ class AudiTVCApp(QWidget):
         self.time_label = QLabel("00:00:00")
         self.time_label.setStyleSheet("color: #aaa; font-size: 10px; margin-left: 6px;")
 
+        self.quality_label = QLabel(f"Quality: {self.preview_governor.name}")
+        self.quality_label.setStyleSheet("color: #aaa; font-size: 10px; margin-left: 6px;")
+
         self.prev_btn = QPushButton("⏮")
         self.prev_btn.setFixedSize(32, 32)
         self.prev_btn.setStyleSheet(self.button_style())
@@ -526,6 +2186,7 @@ class AudiTVCApp(QWidget):
 
         controls_layout.addWidget(self.slider, 4)
         controls_layout.addWidget(self.time_label, 1)
+        controls_layout.addWidget(self.quality_label)
         controls_layout.addSpacing(10)
         controls_layout.addWidget(self.prev_btn)
         controls_layout.addWidget(self.play_btn)
@@ -544,6 +2205,9 @@ class AudiTVCApp(QWidget):
 
     def load_video(self, file_path):
         self.media_player.setSource(QUrl.fromLocalFile(file_path))
+        self.video_path = file_path
+        self.pending_overlay = None
+        self.audio_standard = None
         self.stack.setCurrentIndex(1)
         self.video_loaded = True
         
@@ -622,9 +2286,11 @@ class AudiTVCApp(QWidget):
             "Image Files (*.png *.jpg *.jpeg *.bmp)"
         )
 
-        if not png_path:
-            return
+        if png_path:
+            self.set_overlay(png_path)
 
+    def set_overlay(self, png_path, fraction=None):
+        """Load the overlay; fraction, when given, is its width relative to the video's."""
         print(f"Loading overlay: {png_path}")
 
         # Load the image
@@ -633,16 +2299,27 @@ class AudiTVCApp(QWidget):
             QMessageBox.warning(self, "Error", "Failed to load overlay image")
             return
 
-        # Resize it to 50% of the video size if needed
-        max_width = self.video_item.size().width() * 0.5
-        max_height = self.video_item.size().height() * 0.5
-
-        if pixmap.width() > max_width or pixmap.height() > max_height:
-            pixmap = pixmap.scaled(
-                int(max_width), int(max_height),
-                Qt.AspectRatioMode.KeepAspectRatio,
+        video_width = self.video_item.size().width()
+        if fraction:
+            pixmap = pixmap.scaledToWidth(
+                max(1, round(video_width * fraction)),
                 Qt.TransformationMode.SmoothTransformation
             )
+        else:
+            # Resize it to 50% of the video size if needed
+            max_width = video_width * 0.5
+            max_height = self.video_item.size().height() * 0.5
+
+            if pixmap.width() > max_width or pixmap.height() > max_height:
+                pixmap = pixmap.scaled(
+                    int(max_width), int(max_height),
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation
+                )
+
+        self.overlay_path = png_path
+        # Renders size the logo to this same share of the frame width
+        self.overlay_fraction = pixmap.width() / video_width if video_width > 0 else None
 
         # Remove previous overlay
         if self.overlay_item:
@@ -656,17 +2333,28 @@ class AudiTVCApp(QWidget):
         # Center the overlay on the video
         self.center_overlay_item()
 
+        self.overlay_item.set_blend_scale(self.preview_blend_scale())
+        self.refresh_overlay_mask()
+
+        print("Overlay loaded, centered, and masked with video frame")
+
+    def refresh_overlay_mask(self):
+        """Re-mask the overlay against the video frame currently on screen."""
+        visible = self.overlay_item.isVisible()
+        self.overlay_item.setVisible(False)
+
         # Render the video scene as background for masking
         scene_img = QImage(self.video_view.viewport().size(), QImage.Format.Format_ARGB32)
         painter = QPainter(scene_img)
         self.video_view.render(painter)
         painter.end()
 
+        self.overlay_item.setVisible(visible)
+
         # Set blended mask from background
         scene_pixmap = QPixmap.fromImage(scene_img)
         self.overlay_item.set_mask_pixmap(scene_pixmap)
-
-        print("Overlay loaded, centered, and masked with video frame")
+        self.last_mask_refresh = time.perf_counter()
 
 
     def center_overlay_item(self):
@@ -695,6 +2383,204 @@ class AudiTVCApp(QWidget):
         y = self.overlay_center.y() - overlay_size.height() / 2
         self.overlay_item.setPos(x, y)
 
+    # Rendering
+    def start_render(self):
+        if not self.video_loaded or not self.overlay_path:
+            QMessageBox.warning(self, "Error", "Please load a video and a PNG overlay first")
+            return
+        if self.render_worker and self.render_worker.isRunning():
+            return
+
+        output_path, _ = QFileDialog.getSaveFileName(
+            self, "Render Video", "", "Video Files (*.mp4 *.mov *.mkv)"
+        )
+        if not output_path:
+            return
+
+        try:
+            verifier = GoldenFrameVerifier(
+                golden_reference_path(self.video_path, self.anim_combo.currentText(), self.overlay_path),
+                timing=self.overlay_timing
+            )
+        except (OSError, ValueError) as e:
+            print(f"Golden frame check disabled: {e}")
+            verifier = None
+
+        renderer = OfflineRenderer(
+            self.video_path, QImage(self.overlay_path), output_path,
+            timing=self.overlay_timing, verifier=verifier,
+            audio_standard=self.audio_standard, settings=self.panel_settings(),
+            overlay_fraction=self.overlay_fraction
+        )
+        self.render_worker = RenderWorker(renderer, exporter=self.metrics_exporter)
+        self.render_worker.progress.connect(
+            lambda percent: self.render_button.setText(f"Rendering {percent}%")
+        )
+        self.render_worker.succeeded.connect(self.render_finished)
+        self.render_worker.failed.connect(self.render_failed)
+        self.render_button.setEnabled(False)
+        self.render_worker.start()
+
+    def render_finished(self, output_path):
+        self.render_button.setText("Render")
+        self.render_button.setEnabled(True)
+        QMessageBox.information(self, "Render", f"Rendered to {output_path}")
+
+        renderer = self.render_worker.renderer
+        if renderer.verification == "missing":
+            self.offer_golden_record(
+                renderer.verifier,
+                "There is no golden reference for this source, animation and overlay yet."
+            )
+
+    def render_failed(self, message):
+        self.render_button.setText("Render")
+        self.render_button.setEnabled(True)
+        QMessageBox.warning(self, "Error", f"Render failed: {message}")
+
+        if isinstance(self.render_worker.error, GoldenFrameMismatch):
+            self.offer_golden_record(
+                self.render_worker.renderer.verifier,
+                "This render differs from its golden reference."
+            )
+
+    def offer_golden_record(self, verifier, reason):
+        answer = QMessageBox.question(
+            self, "Golden Reference",
+            f"{reason}\n\nRecord this render as the golden reference?"
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            verifier.record()
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Cannot record golden reference: {e}")
+
+    # Projects
+    def panel_settings(self):
+        return {
+            "animation": self.anim_combo.currentText(),
+            "ring_size": self.ring_size_spin.value(),
+            "ring_position": self.ring_pos_combo.currentText(),
+            "ring_position_offset": self.ring_pos_spin.value(),
+            "background_scale": self.bg_scale_spin.value(),
+            "ring_color": self.ring_color_combo.currentText(),
+        }
+
+    def project(self):
+        return {
+            "version": PROJECT_VERSION,
+            "source": self.video_path,
+            "overlay": self.overlay_path,
+            "overlay_fraction": self.overlay_fraction,
+            "settings": self.panel_settings(),
+            "timing": vars(self.overlay_timing),
+            "audio_standard": self.audio_standard,
+        }
+
+    def apply_project(self, project, load_sources=True):
+        settings = project["settings"]
+        self.anim_combo.setCurrentText(settings["animation"])
+        self.ring_size_spin.setValue(settings["ring_size"])
+        self.ring_size_slider.setValue(settings["ring_size"])
+        self.ring_pos_combo.setCurrentText(settings["ring_position"])
+        self.ring_pos_spin.setValue(settings["ring_position_offset"])
+        self.bg_scale_spin.setValue(settings["background_scale"])
+        self.bg_scale_slider.setValue(settings["background_scale"])
+        self.ring_color_combo.setCurrentText(settings["ring_color"])
+        self.overlay_timing = OverlayTiming(**project["timing"])
+
+        if not load_sources or not project["source"]:
+            return
+        self.load_video(project["source"])
+        # load_video resets the audio choice for the new source
+        self.audio_standard = project["audio_standard"]
+        if project["overlay"]:
+            # The overlay is sized from the video item; fit_video_view applies
+            # it once the new source's native size is known
+            self.pending_overlay = (project["overlay"], project["overlay_fraction"])
+            self.fit_video_view()
+
+    def open_project_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Open Project", "", "RIVL Projects (*.rivl)"
+        )
+        if path:
+            self.open_project(path)
+
+    def open_project(self, path):
+        try:
+            project = read_project(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.warning(self, "Error", f"Cannot open project: {e}")
+            return
+        self.apply_project(project)
+
+    def save_project_dialog(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Project", "", "RIVL Projects (*.rivl)"
+        )
+        if not path:
+            return
+        if not path.endswith(".rivl"):
+            path += ".rivl"
+        try:
+            write_project(path, self.project())
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Cannot save project: {e}")
+
+    # Audio Setup
+    def open_audio_setup(self):
+        if not self.video_loaded:
+            QMessageBox.warning(self, "Error", "Please load a video first")
+            return
+        if self.loudness_worker and self.loudness_worker.isRunning():
+            return
+
+        self.audio_btn.setText("Analyzing...")
+        self.audio_btn.setEnabled(False)
+        self.loudness_worker = LoudnessWorker(self.video_path)
+        self.loudness_worker.succeeded.connect(self.loudness_measured)
+        self.loudness_worker.failed.connect(self.loudness_failed)
+        self.loudness_worker.start()
+
+    def loudness_measured(self, loudness):
+        self.audio_btn.setText("Audio Setup")
+        self.audio_btn.setEnabled(True)
+
+        def fmt(value, unit):
+            return "silent" if value is None else f"{value:.1f} {unit}"
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Audio Setup")
+        box.setText(
+            f"Integrated: {fmt(loudness['integrated'], 'LUFS')}\n"
+            f"Short-term max: {fmt(loudness['short_term_max'], 'LUFS')}\n"
+            f"True peak: {fmt(loudness['true_peak'], 'dBTP')}\n\n"
+            "Normalize loudness when rendering?"
+        )
+        standards = {
+            box.addButton(name, QMessageBox.ButtonRole.AcceptRole): name
+            for name in LOUDNESS_STANDARDS
+        }
+        box.addButton("Off", QMessageBox.ButtonRole.RejectRole)
+        box.exec()
+        self.audio_standard = standards.get(box.clickedButton())
+
+        if self.audio_standard:
+            shortfall = normalization_shortfall(loudness, self.audio_standard)
+            if shortfall > 0.1:
+                QMessageBox.warning(
+                    self, "Audio Setup",
+                    f"The true peak limit of {self.audio_standard} caps the gain; "
+                    f"the output will be {shortfall:.1f} dB below the target loudness."
+                )
+
+    def loudness_failed(self, message):
+        self.audio_btn.setText("Audio Setup")
+        self.audio_btn.setEnabled(True)
+        QMessageBox.warning(self, "Error", f"Audio analysis failed: {message}")
+
     # Drag & Drop
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -703,49 +2589,116 @@ class AudiTVCApp(QWidget):
     def dropEvent(self, event):
         for url in event.mimeData().urls():
             file_path = url.toLocalFile()
-            if file_path:
+            if file_path.endswith(".rivl"):
+                self.open_project(file_path)
+            elif file_path:
                 self.load_video(file_path)
             break
 
+    def closeEvent(self, event):
+        # A QThread destroyed while running aborts the process
+        running = [worker for worker in (self.render_worker, self.loudness_worker)
+                   if worker and worker.isRunning()]
+        if running:
+            answer = QMessageBox.question(
+                self, "Quit", "A render or audio analysis is still running. Cancel it and quit?"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+            for worker in running:
+                # Nothing is left to report to once the window closes
+                worker.blockSignals(True)
+                worker.cancel()
+            for worker in running:
+                worker.wait()
+
+        try:
+            write_project(SESSION_PATH, self.project())
+        except OSError as e:
+            print(f"Could not save session: {e}")
+        super().closeEvent(event)
+
+    # Adaptive Preview Quality
+    def preview_blend_scale(self):
+        return 0.5 if self.preview_governor.level >= 2 else 1.0
+
+    def apply_preview_quality(self):
+        level = self.preview_governor.level
+
+        if level >= 1:
+            self.preview_transform_mode = Qt.TransformationMode.FastTransformation
+            self.video_view.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+            self.video_view.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+        else:
+            self.preview_transform_mode = Qt.TransformationMode.SmoothTransformation
+            self.video_view.setRenderHints(
+                QPainter.RenderHint.Antialiasing |
+                QPainter.RenderHint.SmoothPixmapTransform
+            )
+
+        if self.overlay_item:
+            self.overlay_item.set_blend_scale(self.preview_blend_scale())
+
+        # The hidden view keeps its geometry, so scene layout is unchanged
+        self.low_res_surface = level >= 3
+        self.video_view.setVisible(not self.low_res_surface)
+        self.low_res_label.setVisible(self.low_res_surface)
+
+        self.mask_refresh_enabled = level < 4
+        self.quality_label.setText(f"Quality: {self.preview_governor.name}")
+
     # UI Update
     def update_ui(self):
         if not self.video_loaded:
             return
 
+        now = time.perf_counter()
         self.fit_video_view()
 
         current_pos_s = self.media_player.position() / 1000
 
         if self.overlay_item:
-            self.overlay_item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
-
-            if current_pos_s <= 2:
-                # Scale + fade in white
-                t = current_pos_s / 2.0
-                eased = 2*t*t if t < 0.5 else 1 - pow(-2*t + 2, 2)/2
-                self.overlay_item.set_scale_progress(eased)
-                self.overlay_item.update_blend_to_white(eased)
-                self.overlay_item.setOpacity(1.0)
-                self.overlay_item.setVisible(True)
-                self.update_overlay_position()
+            self.overlay_item.setTransformationMode(self.preview_transform_mode)
 
-            elif 2 < current_pos_s <= 4:
-                # Hold full size/white
-                self.overlay_item.set_scale_progress(1.0)
-                self.overlay_item.update_blend_to_white(1.0)
-                self.overlay_item.setOpacity(1.0)
+            state = self.overlay_timing.state_at(current_pos_s)
+            if state is None:
+                self.overlay_item.setVisible(False)
+            else:
+                scale_progress, white_fraction, opacity = state
+                if (self.mask_refresh_enabled and
+                        (now - self.last_mask_refresh) * 1000 >= MASK_REFRESH_MS):
+                    self.refresh_overlay_mask()
+                self.overlay_item.set_scale_progress(scale_progress)
+                self.overlay_item.update_blend_to_white(white_fraction)
+                self.overlay_item.setOpacity(opacity)
                 self.overlay_item.setVisible(True)
                 self.update_overlay_position()
 
-            elif 4 < current_pos_s <= 5:
-                # Smooth fade out
-                t = (current_pos_s - 4) / 1.0
-                eased = 1 - pow(1 - t, 3)  # cubic ease-out
-                self.overlay_item.setOpacity(1.0 - eased)
-                self.overlay_item.setVisible(True)
-
-            else:
-                self.overlay_item.setVisible(False)
+        if self.low_res_surface:
+            self.render_low_res_surface()
+
+        # The viewport paint measured here is the one the previous tick caused
+        work_ms = (time.perf_counter() - now) * 1000 + self.video_view.take_paint_ms()
+        if self.preview_governor.record(work_ms):
+            self.apply_preview_quality()
+
+    def render_low_res_surface(self):
+        """Rasterize the scene at reduced resolution; the label upscales it."""
+        view_size = self.video_view.size()
+        image = QImage(
+            max(1, int(view_size.width() * LOW_RES_SURFACE_SCALE)),
+            max(1, int(view_size.height() * LOW_RES_SURFACE_SCALE)),
+            QImage.Format.Format_RGB32
+        )
+        image.fill(Qt.GlobalColor.black)
+        painter = QPainter(image)
+        self.scene.render(
+            painter, QRectF(image.rect()),
+            QRectF(0, 0, view_size.width(), view_size.height())
+        )
+        painter.end()
+        self.low_res_label.setPixmap(QPixmap.fromImage(image))
 
 
 
@@ -774,10 +2727,15 @@ class AudiTVCApp(QWidget):
         
         return QColor(0, 0, 0)  # Default black if can't get frame
 if __name__ == "__main__":
+    if "--verify" in sys.argv:
+        sys.exit(verify_renders(sys.argv[1:]))
+    if "--render" in sys.argv:
+        sys.exit(render_headless(sys.argv[1:]))
+
     app = QApplication(sys.argv)
     
     # Check multimedia support
-    if not QMediaPlayer().isAvailable():
+    if QMediaPlayer is None or not QMediaPlayer().isAvailable():
         QMessageBox.critical(None, "Error", "Multimedia services not available")
         sys.exit(1)
     
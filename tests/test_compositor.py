@@ -0,0 +1,119 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6.QtGui", exc_type=ImportError)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import Qt  # noqa: E402
+from PyQt6.QtGui import QImage, QPainter  # noqa: E402
+
+import RIVL  # noqa: E402
+
+# Qt's raster engine rounds with 8-bit fixed point; allow a couple of levels
+TOLERANCE = 2
+
+
+def random_premultiplied(height, width, seed, opaque=False):
+    rng = np.random.default_rng(seed)
+    rgba = rng.integers(0, 256, (height, width, 4)).astype(np.float32)
+    if opaque:
+        rgba[..., 3] = 255
+    rgba[..., :3] *= rgba[..., 3:4] / 255
+    return np.rint(rgba).astype(np.uint8)
+
+
+def blank_image(width, height):
+    image = QImage(width, height, QImage.Format.Format_RGBA8888_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    return image
+
+
+def assert_close(actual, expected):
+    diff = np.abs(actual.astype(int) - expected.astype(int))
+    assert diff.max() <= TOLERANCE, f"max difference {diff.max()}"
+
+
+@pytest.fixture
+def compositor():
+    compositor = RIVL.TiledFrameCompositor(workers=4, min_tile_rows=4)
+    yield compositor
+    compositor.close()
+
+
+def test_mask_destination_in_matches_qpainter(compositor):
+    background = random_premultiplied(48, 64, 1, opaque=True)
+    logo = random_premultiplied(48, 64, 2)
+
+    expected = blank_image(64, 48)
+    painter = QPainter(expected)
+    painter.drawImage(0, 0, RIVL.array_to_qimage(background))
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
+    painter.drawImage(0, 0, RIVL.array_to_qimage(logo))
+    painter.end()
+
+    assert_close(compositor.mask_destination_in(background, logo), RIVL.qimage_to_array(expected))
+
+
+@pytest.mark.parametrize("fraction", [0.0, 0.3, 0.75, 1.0])
+def test_blend_to_white_matches_qpainter(compositor, fraction):
+    masked = random_premultiplied(40, 56, 3)
+    logo = random_premultiplied(40, 56, 4)
+    white = compositor.white_version(logo)
+
+    # Same sequence as AnimatedOverlayItem.update_blend_to_white
+    expected = blank_image(56, 40)
+    painter = QPainter(expected)
+    painter.setOpacity(1.0 - fraction)
+    painter.drawImage(0, 0, RIVL.array_to_qimage(masked))
+    painter.setOpacity(fraction)
+    painter.drawImage(0, 0, RIVL.array_to_qimage(white))
+    painter.end()
+
+    assert_close(compositor.blend_to_white(masked, white, fraction), RIVL.qimage_to_array(expected))
+
+
+@pytest.mark.parametrize("x, y", [(10, 8), (-12, -6), (70, 50)])
+def test_over_matches_qpainter(compositor, x, y):
+    frame = random_premultiplied(64, 96, 5, opaque=True)
+    overlay = random_premultiplied(24, 40, 6)
+
+    expected = RIVL.array_to_qimage(frame)
+    painter = QPainter(expected)
+    painter.setOpacity(0.6)
+    painter.drawImage(x, y, RIVL.array_to_qimage(overlay))
+    painter.end()
+
+    actual = compositor.over(frame.copy(), overlay, x, y, opacity=0.6)
+    assert_close(actual, RIVL.qimage_to_array(expected))
+
+
+def test_tiling_does_not_change_output(compositor):
+    frame = random_premultiplied(120, 160, 7, opaque=True)
+    logo = random_premultiplied(40, 60, 8)
+    masked = compositor.mask_destination_in(frame, logo)
+    white = compositor.white_version(logo)
+
+    single = RIVL.TiledFrameCompositor(workers=1)
+    try:
+        expected = single.composite_overlay(frame.copy(), masked, white, (80, 60), 0.9, 0.4, 0.8)
+    finally:
+        single.close()
+    actual = compositor.composite_overlay(frame.copy(), masked, white, (80, 60), 0.9, 0.4, 0.8)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_uint16_matches_uint8(compositor):
+    frame = random_premultiplied(32, 32, 9, opaque=True)
+    logo = random_premultiplied(16, 16, 10)
+
+    def composite(frame, logo):
+        masked = compositor.mask_destination_in(frame, logo)
+        white = compositor.white_version(logo)
+        return compositor.composite_overlay(frame.copy(), masked, white, (16, 16), 1.0, 0.5, 0.7)
+
+    deep = composite(frame.astype(np.uint16) * 257, logo.astype(np.uint16) * 257)
+    assert deep.dtype == np.uint16
+    assert_close(np.rint(deep / 257).astype(np.uint8), composite(frame, logo))
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt6.QtGui", exc_type=ImportError)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RIVL  # noqa: E402
+
+
+def run(governor, work_ms_per_level, ticks):
+    """Feed a machine whose work time depends only on the level; return level changes."""
+    changes = 0
+    for _ in range(ticks):
+        changes += governor.record(work_ms_per_level[governor.level])
+    return changes
+
+
+def test_steps_down_when_over_budget():
+    governor = RIVL.PreviewGovernor(budget_ms=16)
+    run(governor, [30, 12, 12, 12, 12], 60)
+    assert governor.name == "Fast transforms"
+
+
+def test_holds_level_inside_budget():
+    governor = RIVL.PreviewGovernor(budget_ms=16)
+    assert run(governor, [14] * 5, 1000) == 0
+    assert governor.level == 0
+
+
+def test_steps_up_with_headroom():
+    governor = RIVL.PreviewGovernor(budget_ms=16)
+    run(governor, [30, 30, 5, 5, 5], 100)
+    assert governor.name == "Reduced blend"
+
+    # The machine speeds up; quality only returns once work is well under budget
+    run(governor, [5] * 5, 400)
+    assert governor.level == 0
+
+
+def test_no_step_up_without_headroom():
+    governor = RIVL.PreviewGovernor(budget_ms=16)
+    run(governor, [25, 12, 12, 12, 12], 100)
+    assert governor.level == 1
+
+    # 75% of budget is on budget but not headroom
+    assert run(governor, [25, 12, 12, 12, 12], 3000) == 0
+
+
+def test_does_not_oscillate_at_the_edge():
+    # Full overruns and Fast transforms only just does: the interval-fed
+    # governor flipped between them about every 140 ticks
+    governor = RIVL.PreviewGovernor(budget_ms=16)
+    assert run(governor, [25, 16.5, 12, 8, 5], 3000) <= 2
+
+
+def test_failed_step_up_backs_off():
+    governor = RIVL.PreviewGovernor(budget_ms=16, up_after=120, max_backoff=8)
+    changes = run(governor, [25, 5, 5, 5, 5], 6000)
+    assert governor.up_wait == 120 * 8
+    # Without backoff every attempt would cost two changes per ~140 ticks
+    assert changes < 6000 / 140
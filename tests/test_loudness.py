@@ -0,0 +1,78 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6.QtGui", exc_type=ImportError)
+pytest.importorskip("scipy.signal")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RIVL  # noqa: E402
+
+RATE = RIVL.LoudnessMeter.SAMPLE_RATE
+
+
+def sine(frequency, seconds, amplitude=1.0, phase=0.0):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t + phase)).astype(np.float32)
+
+
+def measure(signal, weights=None, chunk_s=10):
+    """Run signal (samples x channels) through the meter chunk by chunk, as analyze_loudness does."""
+    meter = RIVL.LoudnessMeter(signal.shape[1], weights)
+    chunk = RATE * chunk_s
+    context = signal[:0]
+    for start in range(0, len(signal), chunk):
+        samples = signal[start:start + chunk]
+        meter.add(meter.measure(context, samples))
+        context = samples
+    return meter.result()
+
+
+def test_full_scale_sine_reads_minus_3_lufs():
+    result = measure(sine(997, 20)[:, None])
+    assert result["integrated"] == pytest.approx(-3.01, abs=0.05)
+    assert result["short_term_max"] == pytest.approx(-3.01, abs=0.05)
+
+
+def test_intersample_peak():
+    # Samples land at 45 degrees, 3 dB below the waveform's real peak
+    signal = sine(12000, 5, phase=np.pi / 4)[:, None]
+    assert np.abs(signal).max() == pytest.approx(0.707, abs=0.001)
+    assert measure(signal)["true_peak"] == pytest.approx(0.0, abs=0.2)
+
+
+def test_silence_is_ungated():
+    result = measure(np.zeros((RATE * 5, 2), dtype=np.float32))
+    assert result["integrated"] is None
+
+
+def test_chunking_matches_one_pass():
+    rng = np.random.default_rng(1)
+    noise = (rng.standard_normal((RATE * 30, 2)) * 0.1).astype(np.float32)
+    whole = measure(noise, chunk_s=30)
+    chunked = measure(noise, chunk_s=1)
+    assert chunked["integrated"] == pytest.approx(whole["integrated"], abs=0.01)
+    assert chunked["true_peak"] == pytest.approx(whole["true_peak"], abs=0.01)
+
+
+def test_surround_weighting():
+    weights = RIVL.CHANNEL_WEIGHTS["5.1"]
+    tone = sine(997, 10, amplitude=0.1)
+
+    def in_channel(channel):
+        signal = np.zeros((len(tone), 6), dtype=np.float32)
+        signal[:, channel] = tone
+        return measure(signal, weights)["integrated"]
+
+    # Surrounds count +1.5 dB over fronts; the LFE is left out
+    assert in_channel(4) - in_channel(0) == pytest.approx(1.5, abs=0.05)
+    assert in_channel(3) is None
+
+
+def test_normalization_shortfall():
+    loudness = {"integrated": -30.0, "short_term_max": -25.0, "true_peak": -3.0}
+    # EBU R128 wants +7 dB, but only +2 dB fits under its -1 dBTP limit
+    assert RIVL.normalization_gain(loudness, "EBU R128") == pytest.approx(2.0)
+    assert RIVL.normalization_shortfall(loudness, "EBU R128") == pytest.approx(5.0)
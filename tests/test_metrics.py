@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip("PyQt6.QtGui", exc_type=ImportError)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RIVL  # noqa: E402
+
+
+def finished_job(job_id, status, child=False):
+    metrics = RIVL.RenderMetrics(job_id, sample_interval=0.01)
+    metrics.start()
+    with metrics.stage("composite"):
+        pass
+    metrics.add_time("encode", 1.5)
+    metrics.count("frames_rendered", 250)
+    if child:
+        process = subprocess.Popen([sys.executable, "-c", "sum(range(10 ** 6))"])
+        assert RIVL.wait_with_usage(process, metrics) == 0
+    metrics.finish(status)
+    return metrics
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = RIVL.MetricsExporter(str(tmp_path), port=0)
+    yield exporter
+    exporter.close()
+
+
+def test_record_appends_one_json_line_per_job(exporter, tmp_path):
+    exporter.record(finished_job("a.mp4", "ok", child=True))
+    exporter.record(finished_job("b.mp4", "failed"))
+
+    lines = (tmp_path / "render_jobs.jsonl").read_text().splitlines()
+    first, second = (json.loads(line) for line in lines)
+    assert (first["job"], first["status"], second["job"], second["status"]) == \
+        ("a.mp4", "ok", "b.mp4", "failed")
+    assert first["stages_s"]["encode"] == 1.5
+    assert first["counters"] == {"frames_rendered": 250}
+    assert first["children_cpu_s"] > 0
+    assert first["children_rss_peak_bytes"] > 0
+    assert second["children_cpu_s"] == 0
+    assert first["job_s"] >= 0 and first["queue_wait_s"] >= 0
+
+
+def test_prometheus_text_totals(exporter, tmp_path):
+    first = finished_job("a.mp4", "ok", child=True)
+    exporter.record(first)
+    exporter.record(finished_job("b.mp4", "ok"))
+    exporter.record(finished_job("c.mp4", "failed"))
+
+    text = (tmp_path / "rivl.prom").read_text()
+    samples = dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+    assert samples['rivl_render_jobs_total{status="ok"}'] == "2"
+    assert samples['rivl_render_jobs_total{status="failed"}'] == "1"
+    assert float(samples['rivl_render_stage_seconds_total{stage="encode"}']) == 4.5
+    assert samples["rivl_render_frames_rendered_total"] == "750"
+    assert samples["rivl_render_job_seconds_count"] == "3"
+    # Only ffmpeg children are summed per job; this process is read at export time
+    assert float(samples["rivl_render_ffmpeg_cpu_seconds_total"]) == \
+        pytest.approx(first.children_cpu_seconds, abs=1e-6)
+    assert float(samples["rivl_process_cpu_seconds_total"]) > 0
+    # Every sample is declared with a TYPE line
+    for name in samples:
+        assert f"# TYPE {name.split('{')[0].removesuffix('_sum').removesuffix('_count')} " in text
+
+
+def test_http_endpoint_serves_the_same_text(exporter):
+    exporter.record(finished_job("a.mp4", "ok"))
+    port = exporter.server.server_address[1]
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        served = response.read().decode()
+    assert 'rivl_render_jobs_total{status="ok"} 1' in served
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
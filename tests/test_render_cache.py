@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("PyQt6.QtGui", exc_type=ImportError)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtGui import QImage  # noqa: E402
+
+import RIVL  # noqa: E402
+
+FPS = 25.0
+SEGMENT_FRAMES = 25
+
+
+@pytest.fixture
+def renderer_for(tmp_path):
+    renderers = []
+
+    def make(timing):
+        renderer = RIVL.OfflineRenderer(
+            "source.mp4", QImage(), str(tmp_path / "out.mp4"), timing=timing,
+            compositor=RIVL.TiledFrameCompositor(workers=1), cache_dir=str(tmp_path)
+        )
+        renderers.append(renderer)
+        return renderer
+
+    yield make
+    for renderer in renderers:
+        renderer.compositor.close()
+
+
+def segment_keys(renderer, total_frames=10 * SEGMENT_FRAMES):
+    return [
+        renderer.segment_key("source", "logo", start, start + SEGMENT_FRAMES, FPS,
+                             to_eof=start + SEGMENT_FRAMES == total_frames)
+        for start in range(0, total_frames, SEGMENT_FRAMES)
+    ]
+
+
+def test_fade_change_only_rekeys_fade_segments(renderer_for):
+    before = segment_keys(renderer_for(RIVL.OverlayTiming(2.0, 4.0, 5.0)))
+    after = segment_keys(renderer_for(RIVL.OverlayTiming(2.0, 4.0, 5.5)))
+
+    changed = [index for index, (old, new) in enumerate(zip(before, after)) if old != new]
+    # One-second segments: the fade now runs 4-5.5 s instead of 4-5 s, and the
+    # frame at exactly 5 s (the start of segment 5) was the old fade's last
+    assert changed == [4, 5]
+
+
+def test_segment_key_covers_logo_only_while_visible(renderer_for):
+    renderer = renderer_for(RIVL.OverlayTiming(2.0, 4.0, 5.0))
+    visible = renderer.segment_key("source", "logo", 0, 25, FPS)
+    hidden = renderer.segment_key("source", "logo", 200, 225, FPS)
+    assert renderer.segment_key("source", "other logo", 0, 25, FPS) != visible
+    assert renderer.segment_key("source", "other logo", 200, 225, FPS) == hidden
+
+
+def test_project_round_trip(tmp_path):
+    project = {
+        "version": RIVL.PROJECT_VERSION,
+        "source": str(tmp_path / "media" / "spot.mp4"),
+        "overlay": str(tmp_path / "media" / "logo.png"),
+        "overlay_fraction": 0.375,
+        "settings": {"animation": "Scale In", "ring_size": 40},
+        "timing": {"intro_end": 1.5, "fade_start": 3.0, "fade_end": 4.0},
+        "audio_standard": "EBU R128",
+    }
+    path = tmp_path / "projects" / "spot.rivl"
+    RIVL.write_project(str(path), project)
+
+    stored = RIVL.load_json_cache(str(path))
+    assert stored["source"] == os.path.join("..", "media", "spot.mp4")
+    assert RIVL.read_project(str(path)) == project
+
+
+def test_read_project_rejects_other_versions(tmp_path):
+    path = tmp_path / "old.rivl"
+    path.write_text('{"version": 0, "source": null, "overlay": null}')
+    with pytest.raises(ValueError):
+        RIVL.read_project(str(path))
+
+
+def write_segment(directory, name, age_s, size=100):
+    path = directory / name
+    path.write_bytes(b"\0" * size)
+    mtime = time.time() - age_s
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    old = RIVL.RENDER_CACHE_GRACE_S + 100
+    oldest = write_segment(tmp_path, "a.mp4", old + 30)
+    older = write_segment(tmp_path, "b.mp4", old + 20)
+    newer = write_segment(tmp_path, "c.mp4", old + 10)
+    kept = write_segment(tmp_path, "d.mp4", old + 40)
+
+    RIVL.prune_render_cache(str(tmp_path), {kept}, max_bytes=250)
+
+    # 400 bytes against a 250 byte cap: the two oldest go, the current job's stays
+    assert sorted(os.listdir(tmp_path)) == ["c.mp4", "d.mp4"]
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(newer)
+
+
+def test_prune_spares_recently_used(tmp_path):
+    write_segment(tmp_path, "stale.mp4", RIVL.RENDER_CACHE_GRACE_S + 100)
+    write_segment(tmp_path, "fresh.mp4", 60)
+
+    RIVL.prune_render_cache(str(tmp_path), set(), max_bytes=0)
+
+    # Still over the cap, but another job may be about to concatenate it
+    assert os.listdir(tmp_path) == ["fresh.mp4"]